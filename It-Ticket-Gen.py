@@ -1,8 +1,29 @@
 import streamlit as st
+import asyncio
+import hashlib
 import json
 import re
 import requests
-from datetime import datetime
+from requests.adapters import HTTPAdapter
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
+from types import MappingProxyType
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+    json_loads = orjson.loads  # Faster drop-in for json.loads when installed
+    json_dumps = orjson.dumps  # Returns bytes, which requests sends as the body unchanged
+except ImportError:
+    json_loads = json.loads
+    json_dumps = json.dumps
+
+def short_error(error, limit=100):
+    """Short display form of an exception or error message."""
+    return str(error)[:limit]
 
 # Page configuration
 st.set_page_config(
@@ -38,7 +59,7 @@ try:
         st.stop()
         
 except Exception as e:
-    st.error(f"Error loading API key: {str(e)[:100]}")
+    st.error(f"Error loading API key: {short_error(e)}")
     st.stop()
 
 # OpenRouter API configuration
@@ -49,6 +70,101 @@ OPENROUTER_HEADERS = {
     "X-Title": "IT Ticket Generator",
     "Content-Type": "application/json"
 }
+# Identifies the key in cache keys without storing the key itself there
+OPENROUTER_API_KEY_HASH = hashlib.sha256(OPENROUTER_API_KEY.encode()).hexdigest()
+
+# Field patterns used to salvage a ticket from malformed JSON
+USER_FIELD_RE = re.compile(r'"user":\s*"([^"]+)"')
+ISSUE_FIELD_RE = re.compile(r'"issue":\s*"([^"]+)"')
+
+# Body of a Markdown code fence, which models often wrap JSON in
+CODE_FENCE_RE = re.compile(r'```(?:json)?\s*(.*?)\s*```', re.DOTALL)
+
+# User-facing messages for common OpenRouter error statuses
+API_ERROR_MESSAGES = {
+    401: "Invalid API key. Please check your OpenRouter API key.",
+    403: "API key doesn't have permission for this model.",
+    404: "Model '{model}' not found. Try a different model.",
+    429: "Rate limit exceeded. Please try again later.",
+}
+
+# Free models allow ~15 requests/min per key; pace calls instead of hitting 429s
+REQUESTS_PER_MINUTE = 15
+RATE_LIMIT_BURST = 5
+# Longest a request waits for the bucket; beyond this the user is asked to cool down
+RATE_LIMIT_MAX_WAIT = 3
+# Tokens kept for clicks: warm-ups and speculative prefetches are skipped
+# unless the bucket would still hold this many after they take theirs
+RATE_LIMIT_RESERVE = 2
+
+# Seconds to connect, and to wait for the first byte of a streamed reply. A
+# non-streamed reply only arrives once fully generated, so it gets READ_TIMEOUT
+# plus time for max_tokens at the slowest generation speed expected.
+CONNECT_TIMEOUT = 5
+STREAM_READ_TIMEOUT = 8
+READ_TIMEOUT = 20
+MIN_TOKENS_PER_SECOND = 20
+# Resends after a streamed reply's first byte times out, each routed to the
+# lowest-latency provider. A timed-out full generation is not resent.
+TIMEOUT_RETRIES = 2
+# Resends after a gateway/upstream 5xx. Like every attempt they take a rate-limit token.
+SERVER_ERROR_RETRIES = 2
+SERVER_ERROR_STATUSES = (500, 502, 503, 504)
+# Minimum seconds between redraws of a streaming reply; each redraw is a
+# websocket message, and fast providers send a chunk every few milliseconds
+STREAM_RENDER_INTERVAL = 0.05
+
+# Worker threads for prefetches and for requests a user is waiting on. The HTTP
+# connection pool is sized to both plus the script thread, so none waits for a socket.
+PREFETCH_WORKERS = 4
+REQUEST_WORKERS = 16
+
+# Identical hint/validation requests are answered from memory (most recent N kept
+# for up to TTL seconds). Sampling above the temperature cap is left uncached.
+RESPONSE_CACHE_SIZE = 64
+RESPONSE_CACHE_TTL = 1800
+RESPONSE_CACHE_MAX_TEMPERATURE = 0.5
+
+# Placeholder fields for a ticket rebuilt from a malformed response.
+# Read-only because issued tickets are mutated; callers copy it.
+DEFAULT_TICKET = MappingProxyType({
+    "user": "IT User",
+    "issue": "Technical issue requiring assistance"
+})
+
+# Per-ticket session state, cleared in one update when a ticket is issued or dropped
+TICKET_RESET = MappingProxyType({
+    "ticket": None,
+    "validation": None,
+    "solution_effective": None,
+    "verdict_model": None,
+    "prefetched_hints": None,
+})
+
+# Decoder for JSON embedded in surrounding prose
+JSON_DECODER = json.JSONDecoder()
+
+# Output token budgets per request type. Ticket budgets are per ticket and
+# multiplied by the batch size; harder levels get longer tickets and hints.
+MAX_TOKENS = {
+    "ticket_simple": 160,  # Ticket budgets include the starter_hints list
+    "ticket_medium": 220,
+    "ticket_complex": 300,
+    "hint_simple": 180,
+    "hint_medium": 300,
+    "hint_complex": 400,
+    "starter_hint": 150,
+    "validation": 48,  # Verdict phrase plus one sentence
+    "feedback": 600,  # Headroom so the JSON is not cut off before the closing brace
+}
+
+# Tickets requested per API call; extras are queued for the next "Generate" click
+TICKET_BATCH_SIZE = 5
+# Start fetching the next batch in the background once this few are left
+TICKET_REFILL_THRESHOLD = 1
+
+# Seconds the first page load waits for /models before showing the curated list
+MODEL_LIST_WAIT = 3
 
 # Curated list of FREE models that work on OpenRouter
 FREE_MODELS = [
@@ -66,75 +182,446 @@ FREE_MODELS = [
     "mistralai/mistral-7b-instruct:free",         # Mistral 7B
 ]
 
+# OpenRouter provider.sort values offered in the sidebar; None keeps its default
+# load balancing. Latency comes first because the app waits on short replies.
+PROVIDER_ROUTING_OPTIONS = {
+    "latency": "Fastest first token",
+    "throughput": "Fastest generation",
+    "price": "Lowest price",
+    None: "OpenRouter default",
+}
+
+# Free models listed first in the sidebar, in this order (matched within the model ID)
+PREFERRED_FREE_MODELS = ("deepseek-r1t-chimera", "gemini-2.0-flash-exp", "llama-3.2")
+
+# Reasoning and large models are slow to produce a one-sentence verdict, so
+# Check Solution hands validation to a faster sibling when one is available.
+FAST_VALIDATION_MODELS = {
+    "tngtech/deepseek-r1t-chimera:free": "google/gemini-2.0-flash-exp:free",
+    "deepseek/deepseek-r1:free": "google/gemini-2.0-flash-exp:free",
+    "nvidia/llama-3.1-nemotron-70b-instruct:free": "meta-llama/llama-3.1-8b-instruct:free",
+    "qwen/qwen-2.5-32b-instruct:free": "meta-llama/llama-3.1-8b-instruct:free",
+}
+
+# Check Solution and Get Feedback ask for more detail instead of calling the
+# API when a solution is shorter than this many words (i.e. empty or one word)
+MIN_SOLUTION_WORDS = 2
+
+# Sidebar model descriptions as (ID fragment, text); the first match is shown
+MODEL_DESCRIPTIONS = (
+    ("deepseek-r1t-chimera", "🧠 **DeepSeek R1 Reasoning** - Excellent for step-by-step thinking"),
+    ("gemini-2.0-flash-exp", "🤖 **Google Gemini 2.0** - Fast and reliable"),
+    ("llama-3.2", "🦙 **Meta Llama 3.2** - Fast 3B model, good for simple tasks"),
+    ("llama-3.1", "🦙 **Meta Llama 3.1** - More capable 8B model"),
+    ("qwen-2.5", "🔷 **Qwen 2.5** - Powerful 32B model by Alibaba"),
+    ("phi-3.5", "💠 **Microsoft Phi 3.5** - Small but capable"),
+    ("deepseek-coder", "💻 **DeepSeek Coder** - Specialized for technical tasks"),
+    ("openchat", "💬 **OpenChat** - Conversational model"),
+    ("dolphin", "🐬 **Dolphin** - Fine-tuned for helpfulness"),
+    ("nemotron", "🎮 **NVIDIA Nemotron** - Powerful 70B model"),
+    ("mistral", "🌪️ **Mistral** - French AI model"),
+)
+
+# Verdict prefixes the evaluation prompts ask for, as (prefix, verdict)
+VERDICT_PREFIXES = (
+    ("✅ YES", "yes"),
+    ("⚠️ PARTIALLY", "partial"),
+    ("❌ NO", "no"),
+)
+# Display text for the one-word verdicts of the combined feedback request
+VERDICT_PHRASES = {
+    "yes": "✅ YES - This solution would likely fix the issue.",
+    "partial": "⚠️ PARTIALLY - This solution might help but needs improvements.",
+    "no": "❌ NO - This solution would not fix the issue.",
+}
+# Structured output for the combined feedback request. Providers without
+# json_schema support ignore it, so the reply is still parsed leniently.
+FEEDBACK_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "feedback",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "verdict": {"type": "string", "enum": list(VERDICT_PHRASES)},
+                "reason": {"type": "string"},
+                "hints": {"type": "string"},
+            },
+            "required": ["verdict", "reason", "hints"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# Per-difficulty UI text, looked up on every rerun of the ticket panel
+DIFFICULTY_BADGES = {
+    "simple": "🟢",
+    "medium": "🟡",
+    "complex": "🔴"
+}
+
+SOLUTION_PLACEHOLDERS = {
+    "simple": "Example: First, I would check if the computer is plugged in...",
+    "medium": "Example: Start by checking network settings, then verify firewall rules...",
+    "complex": "Example: Begin with packet capture analysis, check QoS settings, review network topology..."
+}
+
+HINT_BUTTON_LABELS = {
+    "simple": "💡 Get Hints",
+    "medium": "🎯 Get Guidance",
+    "complex": "🧠 Get Insights"
+}
+
+HINT_TITLES = {
+    "simple": "### 💡 Helpful Hints",
+    "medium": "### 🎯 Targeted Guidance",
+    "complex": "### 🧠 Expert Insights"
+}
+
+# Static help text, kept here so the layout code below stays short
+HOW_IT_WORKS_MARKDOWN = """
+### **🎯 Two-Step Learning Process**
+
+**1. 💡 Get Helpful Hints**
+- Get guidance tailored to difficulty level
+- Improve your thinking without full answers
+- Learn systematic troubleshooting
+
+**2. ✅ Validate Your Solution**
+- See if your solution would actually work
+- Get clear evaluation (✅/⚠️/❌)
+- Understand why solutions succeed or fail
+
+**🚀 Learning Path:**
+Try solution → Get hints → Improve → Check again → Learn!
+"""
+
+TIPS_MARKDOWN = """
+### **🎯 Using Free Models Effectively:**
+
+**Recommended Models:**
+1. **🧠 DeepSeek R1 Chimera** - Best for reasoning and step-by-step thinking
+2. **🤖 Gemini 2.0 Flash** - Fast and reliable for most tasks
+3. **🦙 Llama 3.2 3B** - Quick responses for simple issues
+
+**Best Practices:**
+- Start with **Simple** difficulty if models are slow
+- Keep your solution descriptions **concise**
+- If a model fails, try another free model
+- Free models work best with shorter prompts
+
+**Troubleshooting:**
+- **Model not found**: Click "🔄 Refresh Models List"
+- **No response**: Try a different free model
+- **JSON errors**: The model might need clearer instructions
+- **Slow responses**: Try Llama 3.2 3B (fastest free model)
+
+**All models listed are FREE and require no credits!**
+"""
+
 # Initialize session state
 if 'ticket' not in st.session_state:
     st.session_state.ticket = None
 if 'validation' not in st.session_state:
     st.session_state.validation = None
-if 'agent_response' not in st.session_state:
-    st.session_state.agent_response = ""
 if 'selected_model' not in st.session_state:
     st.session_state.selected_model = "tngtech/deepseek-r1t-chimera:free"  # Default to DeepSeek R1
 if 'solution_effective' not in st.session_state:
     st.session_state.solution_effective = None
+if 'verdict_model' not in st.session_state:
+    st.session_state.verdict_model = None  # Model that produced solution_effective
 if 'available_models_working' not in st.session_state:
     st.session_state.available_models_working = []
+if 'models_future' not in st.session_state:
+    st.session_state.models_future = None  # Background /models fetch not yet applied
+if 'ticket_queue' not in st.session_state:
+    st.session_state.ticket_queue = {}  # (model, difficulty) -> pre-generated tickets
+if 'ticket_refills' not in st.session_state:
+    st.session_state.ticket_refills = {}  # (model, difficulty) -> future for the next batch
+if 'prefetched_hints' not in st.session_state:
+    st.session_state.prefetched_hints = None  # Future for the current ticket's starter hints
+if 'provider_sort' not in st.session_state:
+    st.session_state.provider_sort = "latency"  # Set from the sidebar routing choice
+if 'pending_hints' not in st.session_state:
+    st.session_state.pending_hints = None  # ((model, difficulty, issue, solution), future) started by Check Solution
+if 'warmed_models' not in st.session_state:
+    st.session_state.warmed_models = set()  # Models already sent a warm-up request
 
-def get_available_models_from_api():
-    """Get available models from OpenRouter API with focus on free models."""
+@st.cache_data(ttl=3600, show_spinner=False)
+def fetch_model_ids(api_key_hash, _api_key):
+    """Fetch text-generation model IDs from OpenRouter, cached per API key for an hour.
+    
+    Only api_key_hash is part of the cache key; Streamlit skips _-prefixed arguments.
+    """
+    # The shared session already carries the auth header and an open connection
+    response = get_http_session(_api_key).get(
+        "https://openrouter.ai/api/v1/models",
+        timeout=10
+    )
+    response.raise_for_status()
+    
+    # Skip vision and embedding models
+    return tuple(
+        model_id
+        for model_id in (model.get("id", "") for model in json_loads(response.content).get("data", []))
+        if model_id and "vision" not in model_id.lower() and "embed" not in model_id.lower()
+    )
+
+def get_available_models_from_api(model_ids_future=None):
+    """Get available models from OpenRouter API with focus on free models.
+    
+    model_ids_future, if given, is a finished background fetch_model_ids call
+    whose result is used instead of fetching again.
+    """
     try:
-        response = requests.get(
-            "https://openrouter.ai/api/v1/models",
-            headers={"Authorization": f"Bearer {OPENROUTER_API_KEY}"},
-            timeout=10
-        )
+        ranked_free_models = []
+        paid_models = []
+        model_ids = model_ids_future.result() if model_ids_future else fetch_model_ids(OPENROUTER_API_KEY_HASH, OPENROUTER_API_KEY)
         
-        if response.status_code == 200:
-            models_data = response.json()
-            free_models = []
-            paid_models = []
+        for model_id in model_ids:
+            # Prioritize free models
+            if ":free" in model_id:
+                # Put our preferred models first
+                rank = next(
+                    (i for i, key in enumerate(PREFERRED_FREE_MODELS) if key in model_id),
+                    len(PREFERRED_FREE_MODELS)
+                )
+                ranked_free_models.append((rank, model_id))
+            else:
+                paid_models.append(model_id)
+        
+        # One stable sort; models of equal rank keep the API's order
+        ranked_free_models.sort(key=lambda ranked: ranked[0])
+        free_models = [model_id for _, model_id in ranked_free_models]
+        
+        # Combine free models first, then paid
+        all_models = free_models + paid_models[:5]  # Limit paid models to top 5
+        
+        # If we got models from API, use them (but ensure our curated free models are included)
+        if all_models:
+            # Return top 15 models, always keeping the curated free models the API lists
+            free_set = set(free_models)
+            curated_set = {model for model in FREE_MODELS if model in free_set}
+            other_slots = 15 - len(curated_set)
             
-            # Extract model IDs and filter
-            for model in models_data.get("data", []):
-                model_id = model.get("id", "")
-                if model_id:
-                    # Skip vision and embedding models
-                    if "vision" not in model_id.lower() and "embed" not in model_id.lower():
-                        # Prioritize free models
-                        if ":free" in model_id:
-                            # Put our preferred models first
-                            if "deepseek-r1t-chimera" in model_id:
-                                free_models.insert(0, model_id)
-                            elif "gemini-2.0-flash-exp" in model_id:
-                                free_models.insert(min(1, len(free_models)), model_id)
-                            elif "llama-3.2" in model_id:
-                                free_models.insert(min(2, len(free_models)), model_id)
-                            else:
-                                free_models.append(model_id)
-                        else:
-                            paid_models.append(model_id)
+            shown_models = []
+            for model in all_models:
+                if model in curated_set:
+                    shown_models.append(model)
+                elif other_slots > 0:
+                    shown_models.append(model)
+                    other_slots -= 1
             
-            # Combine free models first, then paid
-            all_models = free_models + paid_models[:5]  # Limit paid models to top 5
+            return shown_models
             
-            # If we got models from API, use them (but ensure our curated free models are included)
-            if all_models:
-                # Add any missing curated free models
-                for model in FREE_MODELS:
-                    if model not in all_models and model in free_models:
-                        all_models.insert(0, model)
-                
-                return all_models[:15]  # Return top 15 models
-                
     except Exception as e:
-        st.sidebar.warning(f"Could not fetch models from API: {str(e)[:50]}")
+        st.sidebar.warning(f"Could not fetch models from API: {short_error(e, 50)}")
         st.sidebar.info("Using curated free models list")
     
     # Fallback to our curated free models list
     return FREE_MODELS
 
-def call_openrouter_api(model, messages, max_tokens=300, temperature=0.7):
-    """Make API call to OpenRouter."""
+@st.cache_resource(show_spinner=False)
+def get_http_session(api_key):
+    """Shared HTTP session so repeat calls reuse the open TLS connection to OpenRouter."""
+    session = requests.Session()
+    session.headers.update(OPENROUTER_HEADERS)
+    # Retry brief upstream failures of the /models GET in the adapter. Completions
+    # (POST) are resent by request_completion, which takes a rate-limit token for
+    # each attempt. 429 is left to the rate limiter and classify_api_error, since
+    # honouring Retry-After could stall the UI.
+    retries = Retry(
+        total=2,
+        read=0,
+        backoff_factor=0.3,
+        status_forcelist=SERVER_ERROR_STATUSES,
+        allowed_methods=frozenset({"GET"}),
+        raise_on_status=False
+    )
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=PREFETCH_WORKERS + REQUEST_WORKERS + 1,
+                                          max_retries=retries))
+    return session
+
+def classify_api_error(status_code, error_msg, model):
+    """Turn an OpenRouter error response into a short user-facing message."""
+    error_msg = short_error(error_msg, 256)  # Only the start is shown or searched
+    if status_code == 400 and "context_length" in error_msg.lower():
+        return "Response too long. Please try a shorter prompt."
+    
+    message = API_ERROR_MESSAGES.get(status_code)
+    if message:
+        return message.format(model=model)
+    return f"API Error {status_code}: {error_msg[:100]}"
+
+class RateLimiter:
+    """Token bucket that paces API calls to stay under the per-key request limit."""
+    
+    def __init__(self, requests_per_minute, burst):
+        self.capacity = burst
+        self.refill_rate = requests_per_minute / 60.0  # tokens per second
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self, max_wait=None):
+        """Wait for a token and consume it. Returns 0.
+        
+        If the wait would exceed max_wait seconds, returns the wait instead
+        without waiting or consuming a token.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return 0
+                wait = (1 - self.tokens) / self.refill_rate
+            if max_wait is not None and wait > max_wait:
+                return wait
+            time.sleep(wait)
+    
+    def try_acquire(self, reserve=0):
+        """Consume a token without waiting, only if `reserve` more remain after it."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_rate)
+            self.updated = now
+            if self.tokens >= 1 + reserve:
+                self.tokens -= 1
+                return True
+            return False
+
+@st.cache_resource(show_spinner=False)
+def get_rate_limiter(api_key):
+    """One limiter per API key, shared by every session and rerun."""
+    return RateLimiter(REQUESTS_PER_MINUTE, RATE_LIMIT_BURST)
+
+class ResponseCache:
+    """Thread-safe LRU of completion texts keyed on the full request, with expiry."""
+    
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        self.lock = threading.Lock()
+    
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+    
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+@st.cache_resource(show_spinner=False)
+def get_response_cache():
+    """Response cache shared across reruns (a module-level lru_cache would reset each rerun)."""
+    return ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)
+
+@st.cache_resource(show_spinner=False)
+def get_background_executor():
+    """Worker threads for requests made ahead of the user asking for them."""
+    return ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+
+@st.cache_resource(show_spinner=False)
+def get_request_executor():
+    """Worker threads for requests a user is waiting on. Kept apart from the
+    prefetch pool so a click never queues behind other sessions' prefetches."""
+    return ThreadPoolExecutor(max_workers=REQUEST_WORKERS, thread_name_prefix="request")
+
+def read_openrouter_stream(response, on_token):
+    """Collect a streamed (SSE) completion, passing the text so far to on_token.
+    
+    on_token is called at most every STREAM_RENDER_INTERVAL seconds (sooner
+    when a line ends) and once more with the complete text.
+    """
+    text = ""
+    rendered_text = ""
+    last_render = 0.0
+    try:
+        for raw_line in response.iter_lines():
+            line = raw_line.decode("utf-8")
+            # Skip blank separators and ": OPENROUTER PROCESSING" keep-alives
+            if not line.startswith("data: "):
+                continue
+            data = line[len("data: "):]
+            if data == "[DONE]":
+                break
+            
+            chunk = json_loads(data)
+            if "error" in chunk:
+                # Callers add their own "API Error:" prefix
+                return None, chunk["error"].get("message", "stream interrupted")[:100]
+            
+            # Usage-only and keep-alive chunks can arrive with "choices": []
+            delta = (chunk.get("choices") or [{}])[0].get("delta", {}).get("content")
+            if delta:
+                text += delta
+                now = time.monotonic()
+                if "\n" in delta or now - last_render >= STREAM_RENDER_INTERVAL:
+                    on_token(text)
+                    rendered_text = text
+                    last_render = now
+    finally:
+        response.close()
+    
+    if text != rendered_text:
+        on_token(text)
+    return text, None
+
+def call_openrouter_api(model, messages, max_tokens=300, temperature=0.7, stop=None, on_token=None, use_cache=False,
+                        provider_sort=None, refresh_cache=False, response_format=None, optional=False):
+    """Make API call to OpenRouter.
+    
+    If on_token is given the response is streamed and on_token is called with
+    the accumulated text as each chunk arrives. With use_cache, an identical
+    earlier request is answered from the response cache without an API call;
+    refresh_cache skips that lookup but still stores the new reply.
+    provider_sort asks OpenRouter to pick the provider by that metric
+    (e.g. "throughput") instead of its default load balancing. response_format
+    is passed through to request JSON or schema-constrained output. An
+    optional request (a warm-up or prefetch) is skipped with an error instead
+    of using rate-limit tokens held back for the user's clicks.
+    """
+    cache_key = None
+    if use_cache and temperature <= RESPONSE_CACHE_MAX_TEMPERATURE:
+        cache_key = (
+            model,
+            tuple((message["role"], message["content"]) for message in messages),
+            max_tokens,
+            temperature,
+            tuple(stop or ()),
+            json_dumps(response_format) if response_format else None,
+        )
+        cached_text = None if refresh_cache else get_response_cache().get(cache_key)
+        if cached_text is not None:
+            if on_token:
+                on_token(cached_text)
+            return cached_text, None
+    
+    response_text, error = request_completion(model, messages, max_tokens, temperature, stop, on_token, provider_sort,
+                                              response_format, optional)
+    
+    if cache_key is not None and response_text and not error:
+        get_response_cache().put(cache_key, response_text)
+    return response_text, error
+
+def request_completion(model, messages, max_tokens, temperature, stop, on_token, provider_sort, response_format=None,
+                       optional=False):
+    """Send one chat completion request to OpenRouter. Returns (text, error)."""
     try:
         payload = {
             "model": model,
@@ -142,68 +629,124 @@ def call_openrouter_api(model, messages, max_tokens=300, temperature=0.7):
             "max_tokens": max_tokens,
             "temperature": temperature,
         }
+        if stop:
+            payload["stop"] = stop  # End generation early once the useful part is done
+        if on_token:
+            payload["stream"] = True
+        if response_format:
+            payload["response_format"] = response_format
+        if provider_sort:
+            payload["provider"] = {"sort": provider_sort, "allow_fallbacks": True}
         
-        response = requests.post(
-            OPENROUTER_API_URL,
-            headers=OPENROUTER_HEADERS,
-            json=payload,
-            timeout=30
-        )
+        session = get_http_session(OPENROUTER_API_KEY)
+        if on_token:
+            read_timeout, retries = STREAM_READ_TIMEOUT, TIMEOUT_RETRIES
+        else:
+            read_timeout, retries = READ_TIMEOUT + max_tokens / MIN_TOKENS_PER_SECOND, 0
+        for attempt in range(max(retries, SERVER_ERROR_RETRIES) + 1):
+            # Every attempt is a request against the per-key limit
+            if optional:
+                if not get_rate_limiter(OPENROUTER_API_KEY).try_acquire(RATE_LIMIT_RESERVE):
+                    return None, "Skipped to keep requests free for your clicks."
+                wait = 0
+            else:
+                wait = get_rate_limiter(OPENROUTER_API_KEY).acquire(RATE_LIMIT_MAX_WAIT)
+            if wait:
+                return None, f"Too many requests in a row. Please wait {int(wait) + 1}s and try again."
+            try:
+                response = session.post(
+                    OPENROUTER_API_URL,
+                    data=json_dumps(payload),  # Content-Type is set on the session
+                    timeout=(CONNECT_TIMEOUT, read_timeout),
+                    stream=bool(on_token)
+                )
+            except requests.exceptions.ReadTimeout:
+                if attempt >= retries:
+                    raise
+                # A stalled provider rarely recovers, so resend to the fastest one
+                time.sleep(0.5 * 2 ** attempt)
+                payload["provider"] = {"sort": "latency", "allow_fallbacks": True}
+                continue
+            if response.status_code not in SERVER_ERROR_STATUSES or attempt >= SERVER_ERROR_RETRIES:
+                break
+            response.close()
+            time.sleep(0.3 * 2 ** attempt)
         
         if response.status_code == 200:
-            result = response.json()
+            if on_token:
+                return read_openrouter_stream(response, on_token)
+            result = json_loads(response.content)
             return result["choices"][0]["message"]["content"], None
         else:
-            error_data = response.json()
-            error_msg = error_data.get("error", {}).get("message", response.text)
-            
-            if response.status_code == 401:
-                return None, "Invalid API key. Please check your OpenRouter API key."
-            elif response.status_code == 404:
-                return None, f"Model '{model}' not found. Try a different model."
-            elif response.status_code == 429:
-                return None, "Rate limit exceeded. Please try again later."
-            elif response.status_code == 403:
-                return None, "API key doesn't have permission for this model."
-            elif response.status_code == 400 and "context_length" in error_msg.lower():
-                return None, "Response too long. Please try a shorter prompt."
-            else:
-                return None, f"API Error {response.status_code}: {error_msg[:100]}"
+            try:
+                error_msg = json_loads(response.content).get("error", {}).get("message", response.text)
+            except ValueError:
+                error_msg = response.text  # Proxies and gateways may answer with HTML
+            return None, classify_api_error(response.status_code, error_msg, model)
                 
     except requests.exceptions.Timeout:
         return None, "Request timeout. Please try again."
     except requests.exceptions.ConnectionError:
         return None, "Connection error. Please check your internet connection."
     except Exception as e:
-        return None, f"Error: {str(e)[:100]}"
+        return None, f"Error: {short_error(e)}"
+
+def load_bare_json(text):
+    """Decode a reply that is only JSON, optionally wrapped in one code fence.
+    
+    Returns None for anything else. A fence elsewhere in the reply (an example
+    before the JSON, or backticks inside a string value) is left alone.
+    """
+    stripped = text.strip()
+    try:
+        return json_loads(stripped)
+    except ValueError:
+        pass
+    fence_match = CODE_FENCE_RE.match(stripped) if stripped.startswith("```") else None
+    if fence_match:
+        try:
+            return json_loads(fence_match.group(1))
+        except ValueError:
+            pass
+    return None
+
+def decode_first_json(text, open_char="{", accept=lambda value: isinstance(value, dict)):
+    """Decode the first accepted JSON value starting at an open_char, ignoring text around it."""
+    start = text.find(open_char)
+    while start != -1:
+        try:
+            # raw_decode parses from start in C and stops at the end of the value
+            value = JSON_DECODER.raw_decode(text, start)[0]
+            if accept(value):
+                return value
+        except ValueError:
+            pass
+        start = text.find(open_char, start + 1)
+    return None
 
 def parse_json_from_text(text):
     """Extract and parse JSON from text."""
     try:
-        # Clean the text - remove markdown code blocks
-        cleaned_text = text.strip()
-        cleaned_text = cleaned_text.replace('```json', '').replace('```', '').strip()
+        # Fast path: the prompts ask for bare JSON, so try it as-is first
+        data = load_bare_json(text)
+        if isinstance(data, dict):
+            return data
         
-        # Try to find JSON object in the text
-        json_match = re.search(r'\{.*\}', cleaned_text, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(0)
-            return json.loads(json_str)
+        # Try to find JSON object in the text, fenced or not
+        data = decode_first_json(text)
+        if data is not None:
+            return data
         
         # If no complete JSON found, try to build it manually
-        ticket_data = {
-            "user": "IT User",
-            "issue": "Technical issue requiring assistance",
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M")
-        }
+        ticket_data = dict(DEFAULT_TICKET)  # Stamped when it is issued, like any ticket
         
         # Try to extract user
-        user_match = re.search(r'"user":\s*"([^"]+)"', cleaned_text)
+        user_match = USER_FIELD_RE.search(text)
         if user_match:
             ticket_data["user"] = user_match.group(1)
         
         # Try to extract issue
-        issue_match = re.search(r'"issue":\s*"([^"]+)"', cleaned_text)
+        issue_match = ISSUE_FIELD_RE.search(text)
         if issue_match:
             ticket_data["issue"] = issue_match.group(1)
         
@@ -212,16 +755,51 @@ def parse_json_from_text(text):
     except Exception as e:
         return None
 
-def get_hint_prompt(ticket_issue, proposed_solution, difficulty_level):
-    """Create a hint prompt based on difficulty level."""
+def parse_json_list_from_text(text):
+    """Extract a list of ticket objects from text, falling back to a single object.
     
-    if difficulty_level == "simple":
-        return f"""
+    Returns [] when no ticket with an issue can be found.
+    """
+    try:
+        items = load_bare_json(text)
+        if isinstance(items, dict) and len(items) == 1:
+            # Unwrap {"tickets": [...]} and similar single-key wrappers
+            items = next(iter(items.values()))
+        if not isinstance(items, list):
+            # Skip bracketed prose such as "[1]" before the actual ticket array
+            items = decode_first_json(
+                text, "[", lambda value: isinstance(value, list) and any(isinstance(item, dict) for item in value)
+            )
+        
+        if isinstance(items, list):
+            tickets = [item for item in items if isinstance(item, dict) and item.get("issue")]
+            if tickets:
+                return tickets
+    except Exception:
+        pass
+    
+    # The model may have ignored the batch request and returned one ticket.
+    # Placeholders and objects without an issue aren't worth issuing.
+    ticket = parse_json_from_text(text)
+    if ticket and ticket.get("issue") and ticket["issue"] != DEFAULT_TICKET["issue"]:
+        return [ticket]
+    return []
+
+# System prompts, one per request type. Keeping each byte-identical across
+# calls lets providers that cache prompt prefixes reuse them.
+SYSTEM_PROMPT_TICKETS = "You are an IT support ticket generator. Return ONLY a valid JSON array of objects with 'user', 'issue' and 'starter_hints' fields. No explanations, just JSON."
+SYSTEM_PROMPT_HINTS = "You are an IT mentor providing helpful hints. Be concise and guiding."
+SYSTEM_PROMPT_VALIDATION = "You are an IT solution evaluator. Always start with ✅ YES, ⚠️ PARTIALLY, or ❌ NO followed by one sentence."
+SYSTEM_PROMPT_FEEDBACK = "You are an IT mentor and solution evaluator. Return ONLY valid JSON with 'verdict', 'reason' and 'hints' fields."
+
+# Prompt templates, built once at import and filled with str.format
+HINT_PROMPT_TEMPLATES = {
+    "simple": """
 You are a helpful IT mentor. The user has proposed this solution:
 
-**Issue:** {ticket_issue}
+**Issue:** {issue}
 
-**User's Solution:** {proposed_solution}
+**User's Solution:** {solution}
 
 Provide 2-3 gentle hints that would help improve their solution WITHOUT giving away the full answer.
 
@@ -234,15 +812,14 @@ Example format:
 - A good next step would be [suggestion]
 
 Keep it encouraging and focused on guiding thinking.
-"""
+""",
     
-    elif difficulty_level == "medium":
-        return f"""
+    "medium": """
 You are an IT trainer. The user has proposed this solution:
 
-**Issue:** {ticket_issue}
+**Issue:** {issue}
 
-**User's Solution:** {proposed_solution}
+**User's Solution:** {solution}
 
 Provide targeted guidance that helps them improve their approach. Focus on:
 - One specific area that needs more detail
@@ -258,15 +835,14 @@ Example format:
 • **Consider this concept:** [technical concept]
 
 Be specific but don't solve it for them.
-"""
+""",
     
-    else:  # complex
-        return f"""
+    "complex": """
 You are a senior IT expert. The user has proposed this solution:
 
-**Issue:** {ticket_issue}
+**Issue:** {issue}
 
-**User's Solution:** {proposed_solution}
+**User's Solution:** {solution}
 
 Provide expert insights that challenge their thinking. Focus on:
 - Strategic approach considerations
@@ -282,16 +858,29 @@ Example format:
 • **Alternative method:** [different approach]
 
 Challenge assumptions without giving direct answers.
+""",
+}
+
+STARTER_HINT_PROMPT_TEMPLATE = """
+You are an IT mentor. A trainee has just received this {difficulty} support ticket and has not proposed a solution yet:
+
+**Issue:** {issue}
+
+Give 2-3 short pointers on where to start investigating WITHOUT giving away the full answer.
+
+Format:
+💡 **Where to Start:**
+- [area to check first]
+- [question to ask the user]
+- [tool or log worth looking at]
 """
 
-def get_validation_prompt(ticket_issue, proposed_solution):
-    """Create a validation prompt to check if solution would work."""
-    return f"""
+VALIDATION_PROMPT_TEMPLATE = """
 Based on this IT issue and proposed solution, evaluate if the solution would effectively fix the issue.
 
-**Issue:** {ticket_issue}
+**Issue:** {issue}
 
-**Proposed Solution:** {proposed_solution}
+**Proposed Solution:** {solution}
 
 Evaluate the solution and answer with one of these exact phrases:
 - "✅ YES - This solution would likely fix the issue."
@@ -308,66 +897,394 @@ Example responses:
 IMPORTANT: Start your response with exactly one of the three options above.
 """
 
-def get_ticket_prompt(difficulty_level):
-    """Generate appropriate ticket based on difficulty."""
-    if difficulty_level == "simple":
-        return """
-Create a simple, common IT support ticket. Provide ONLY a valid JSON object with these exact fields:
-- "user": Name and department
-- "issue": Clear description of a basic IT problem
+# Hint style requested by the combined verdict + hints prompt
+COMBINED_HINT_STYLES = {
+    "simple": "2-3 gentle hints pointing to general areas or common troubleshooting steps",
+    "medium": "targeted guidance: one area that needs more detail, one common oversight, and one technical concept to consider",
+    "complex": "expert insights: one strategic consideration, one deeper investigation path, and one alternative method"
+}
 
-Make the issue simple and common. Good for beginners.
+COMBINED_PROMPT_TEMPLATE = """
+You are an IT mentor reviewing a proposed solution to a support ticket.
 
-Example format:
-{
-  "user": "Sarah from Marketing",
-  "issue": "Computer won't turn on. No lights or sounds when power button is pressed."
-}
+**Issue:** {issue}
+
+**Proposed Solution:** {solution}
 
-Return ONLY the JSON object, no other text.
+Do two things:
+1. Evaluate if the solution would effectively fix the issue. The verdict must be exactly one word:
+   - "yes" if it would likely fix the issue
+   - "partial" if it might help but needs improvements
+   - "no" if it would not fix the issue
+   Then give ONE brief reason (max 1 sentence).
+2. Write {hint_style}, as a short markdown bullet list. Guide their thinking WITHOUT giving away the full answer.
+
+Return ONLY a JSON object with these exact fields, no other text:
+{{
+  "verdict": "yes, partial or no",
+  "reason": "one sentence",
+  "hints": "markdown bullet list"
+}}
 """
-    
-    elif difficulty_level == "medium":
-        return """
-Create a medium-difficulty IT support ticket. Provide ONLY a valid JSON object with these exact fields:
+
+# Per-difficulty wording and example for the ticket batch prompt
+TICKET_DIFFICULTY_PROMPTS = {
+    "simple": {
+        "kind": "simple, common IT support tickets",
+        "issue": "Clear description of a basic IT problem",
+        "guidance": "Make each issue simple and common. Good for beginners.",
+        "example_user": "Sarah from Marketing",
+        "example_issue": "Computer won't turn on. No lights or sounds when power button is pressed.",
+        "example_hints": '"Check the power cable and outlet", "Ask whether the monitor shows anything"',
+    },
+    "medium": {
+        "kind": "medium-difficulty IT support tickets",
+        "issue": "IT problem requiring some technical knowledge",
+        "guidance": "Make each issue realistic with some technical details. Good for intermediate users.",
+        "example_user": "Alex from Engineering",
+        "example_issue": "Outlook emails are going to Junk folder instead of Inbox. This happens with emails from specific domains only.",
+        "example_hints": '"Look at the junk mail filter settings", "Compare the affected sender domains"',
+    },
+    "complex": {
+        "kind": "complex IT support tickets",
+        "issue": "Challenging IT problem requiring investigation",
+        "guidance": "Make each issue complex with technical details and specific scenarios. Good for advanced users.",
+        "example_user": "Network Admin from IT Department",
+        "example_issue": "Intermittent packet loss between main office and cloud servers. Issue occurs randomly between 2-4 PM daily.",
+        "example_hints": '"Correlate the loss window with scheduled jobs", "Trace the path at 2 PM and at a quiet time"',
+    },
+}
+
+BATCH_TICKET_PROMPT_TEMPLATE = """
+Create a JSON array of {count} {kind}. Every ticket must come from a different user and describe a different problem.
+
+Each ticket is an object with these exact fields:
 - "user": Name and department
-- "issue": IT problem requiring some technical knowledge
+- "issue": {issue}
+- "starter_hints": A list of 2-3 short pointers on where to start investigating, without giving away the fix. The trainee only sees them on request.
 
-Make the issue realistic with some technical details. Good for intermediate users.
+{guidance}
 
-Example format:
-{
-  "user": "Alex from Engineering",
-  "issue": "Outlook emails are going to Junk folder instead of Inbox. This happens with emails from specific domains only."
-}
+Example format (one ticket shown; return {count}):
+[
+  {{
+    "user": "{example_user}",
+    "issue": "{example_issue}",
+    "starter_hints": [{example_hints}]
+  }}
+]
 
-Return ONLY the JSON object, no other text.
+Return ONLY the JSON array of {count} objects, no other text.
 """
+
+def get_hint_prompt(ticket_issue, proposed_solution, difficulty_level):
+    """Create a hint prompt based on difficulty level."""
+    template = HINT_PROMPT_TEMPLATES.get(difficulty_level, HINT_PROMPT_TEMPLATES["complex"])
+    return template.format(issue=ticket_issue, solution=proposed_solution)
+
+def get_starter_hint_prompt(ticket_issue, difficulty_level):
+    """Create a prompt for pointers that don't depend on the user's solution."""
+    return STARTER_HINT_PROMPT_TEMPLATE.format(issue=ticket_issue, difficulty=difficulty_level)
+
+def get_validation_prompt(ticket_issue, proposed_solution):
+    """Create a validation prompt to check if solution would work."""
+    return VALIDATION_PROMPT_TEMPLATE.format(issue=ticket_issue, solution=proposed_solution)
+
+def get_combined_prompt(ticket_issue, proposed_solution, difficulty_level):
+    """Create one prompt that asks for both the verdict and the hints as JSON."""
+    return COMBINED_PROMPT_TEMPLATE.format(
+        issue=ticket_issue,
+        solution=proposed_solution,
+        hint_style=COMBINED_HINT_STYLES.get(difficulty_level, "2-3 helpful hints")
+    )
+
+def get_batch_ticket_prompt(difficulty_level, count):
+    """Ask for several tickets in one request so a single call fills the queue."""
+    return BATCH_TICKET_PROMPT_TEMPLATE.format(
+        count=count,
+        **TICKET_DIFFICULTY_PROMPTS.get(difficulty_level, TICKET_DIFFICULTY_PROMPTS["complex"])
+    )
+
+def fetch_ticket_batch(model, difficulty_level, count=TICKET_BATCH_SIZE, provider_sort=None):
+    """Generate a batch of tickets. Returns (tickets, raw_text, error)."""
+    messages = [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT_TICKETS
+        },
+        {
+            "role": "user", 
+            "content": get_batch_ticket_prompt(difficulty_level, count)
+        }
+    ]
     
-    else:  # complex
-        return """
-Create a complex IT support ticket. Provide ONLY a valid JSON object with these exact fields:
-- "user": Name and department
-- "issue": Challenging IT problem requiring investigation
+    response_text, error = call_openrouter_api(
+        model,
+        messages,
+        max_tokens=MAX_TOKENS.get(f"ticket_{difficulty_level}", MAX_TOKENS["ticket_complex"]) * count,
+        temperature=0.3,
+        provider_sort=provider_sort
+    )
+    
+    if error or not response_text:
+        return [], response_text, error
+    
+    return parse_json_list_from_text(response_text), response_text, None
 
-Make the issue complex with technical details and specific scenarios. Good for advanced users.
+def generate_hints(model, ticket_issue, proposed_solution, difficulty_level, on_token=None, provider_sort=None,
+                   optional=False):
+    """Ask the model for difficulty-appropriate hints on a proposed solution."""
+    hint_prompt = get_hint_prompt(ticket_issue, proposed_solution, difficulty_level)
+    
+    messages = [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT_HINTS
+        },
+        {
+            "role": "user", 
+            "content": hint_prompt
+        }
+    ]
+    
+    return call_openrouter_api(
+        model,
+        messages,
+        max_tokens=MAX_TOKENS.get(f"hint_{difficulty_level}", MAX_TOKENS["hint_complex"]),
+        temperature=0.2,
+        # Also stop if the model starts echoing the template's closing instruction
+        stop=["\n\nExample", "\nKeep it", "\nBe specific", "\nChallenge assumptions"],
+        on_token=on_token,
+        use_cache=True,
+        provider_sort=provider_sort,
+        optional=optional
+    )
 
-Example format:
-{
-  "user": "Network Admin from IT Department",
-  "issue": "Intermittent packet loss between main office and cloud servers. Issue occurs randomly between 2-4 PM daily."
-}
+def format_starter_hints(starter_hints):
+    """Render the starter_hints a ticket came with, or None if it has none."""
+    if isinstance(starter_hints, list):
+        pointers = [str(pointer) for pointer in starter_hints if pointer]
+        if pointers:
+            return "💡 **Where to Start:**\n" + "\n".join(f"- {pointer}" for pointer in pointers)
+    elif isinstance(starter_hints, str) and starter_hints.strip():
+        return starter_hints
+    return None
 
-Return ONLY the JSON object, no other text.
-"""
+def generate_starter_hints(model, ticket_issue, difficulty_level, on_token=None, provider_sort=None, optional=False):
+    """Ask for investigation pointers before the user has written a solution."""
+    messages = [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT_HINTS
+        },
+        {
+            "role": "user",
+            "content": get_starter_hint_prompt(ticket_issue, difficulty_level)
+        }
+    ]
+    
+    return call_openrouter_api(
+        model,
+        messages,
+        max_tokens=MAX_TOKENS["starter_hint"],
+        temperature=0.2,
+        on_token=on_token,
+        use_cache=True,
+        provider_sort=provider_sort,
+        optional=optional
+    )
+
+def validate_solution(model, ticket_issue, proposed_solution, on_token=None, provider_sort=None, refresh_cache=False):
+    """Ask the model whether a proposed solution would fix the issue.
+    
+    refresh_cache asks again even if this solution was already evaluated.
+    """
+    validation_prompt = get_validation_prompt(ticket_issue, proposed_solution)
+    
+    messages = [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT_VALIDATION
+        },
+        {
+            "role": "user", 
+            "content": validation_prompt
+        }
+    ]
+    
+    return call_openrouter_api(
+        model,
+        messages,
+        max_tokens=MAX_TOKENS["validation"],
+        temperature=0.1,
+        stop=["\n\n", "Example"],
+        on_token=on_token,
+        use_cache=True,
+        provider_sort=provider_sort,
+        refresh_cache=refresh_cache
+    )
+
+def get_validation_model(model, available_models):
+    """Model to use for a quick verdict; hints keep the user's choice."""
+    fast_model = FAST_VALIDATION_MODELS.get(model)
+    return fast_model if fast_model in available_models else model
+
+def validate_on_fast_model(model, available_models, ticket_issue, proposed_solution, on_token=None,
+                           provider_sort=None, refresh_cache=False):
+    """validate_solution on get_validation_model's pick, retried on model if that fails.
+    
+    The sibling may be missing or down (the curated list is used until /models
+    answers), so its error shouldn't fail the check. Returns (text, error, judge).
+    """
+    judge = get_validation_model(model, available_models)
+    response_text, error = validate_solution(judge, ticket_issue, proposed_solution, on_token=on_token,
+                                             provider_sort=provider_sort, refresh_cache=refresh_cache)
+    if error and judge != model:
+        judge = model
+        response_text, error = validate_solution(model, ticket_issue, proposed_solution, on_token=on_token,
+                                                 provider_sort=provider_sort, refresh_cache=refresh_cache)
+    return response_text, error, judge
+
+def classify_verdict(result_text):
+    """Verdict ("yes", "partial" or "no") from an evaluation's prefix, or None."""
+    return next((verdict for prefix, verdict in VERDICT_PREFIXES if result_text.startswith(prefix)), None)
+
+def show_verdict(container, result_text, verdict=None):
+    """Render an evaluation in the alert style matching its verdict prefix.
+    
+    verdict, if given, is classify_verdict(result_text) already computed.
+    """
+    verdict = verdict or classify_verdict(result_text)
+    if verdict == "yes":
+        container.success(result_text)
+    elif verdict == "partial":
+        container.warning(result_text)
+    elif verdict == "no":
+        container.error(result_text)
+    else:
+        container.info(result_text)
+
+def evaluate_solution(model, ticket_issue, proposed_solution, difficulty_level, provider_sort=None):
+    """Get the verdict and the hints from a single request.
+    
+    Returns (verdict_text, hints_text, error). Both texts are None without an
+    error when the model didn't return the requested JSON.
+    """
+    messages = [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT_FEEDBACK
+        },
+        {
+            "role": "user", 
+            "content": get_combined_prompt(ticket_issue, proposed_solution, difficulty_level)
+        }
+    ]
+    
+    response_text, error = call_openrouter_api(
+        model,
+        messages,
+        max_tokens=MAX_TOKENS["feedback"],
+        temperature=0.1,
+        use_cache=True,
+        provider_sort=provider_sort,
+        response_format=FEEDBACK_RESPONSE_FORMAT
+    )
+    
+    if error or not response_text:
+        return None, None, error
+    
+    feedback = parse_json_from_text(response_text) or {}
+    verdict = feedback.get("verdict")
+    if isinstance(verdict, str):
+        # Expand the one-word verdict; models that answered with the full phrase keep it
+        verdict = VERDICT_PHRASES.get(verdict.strip().lower(), verdict)
+    reason = feedback.get("reason")
+    hints = feedback.get("hints")
+    if isinstance(hints, list):
+        hints = "\n".join(f"- {hint}" for hint in hints)
+    
+    if not (isinstance(verdict, str) and verdict and isinstance(hints, str) and hints):
+        return None, None, None
+    
+    verdict_text = f"{verdict} {reason}" if isinstance(reason, str) and reason else verdict
+    return verdict_text, hints, None
+
+async def _run_in_thread(func, *args, **kwargs):
+    """Run a blocking API helper on the executor for user-initiated requests."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_request_executor(), partial(func, *args, **kwargs))
 
-# Initialize available models
-if not st.session_state.available_models_working:
+async def get_hints_and_validate(model, ticket_issue, proposed_solution, difficulty_level, available_models,
+                                 provider_sort=None):
+    """Request hints and validation concurrently so the pair waits on one round-trip."""
+    return await asyncio.gather(
+        _run_in_thread(generate_hints, model, ticket_issue, proposed_solution, difficulty_level,
+                       provider_sort=provider_sort),
+        _run_in_thread(validate_on_fast_model, model, available_models, ticket_issue, proposed_solution,
+                       provider_sort=provider_sort)
+    )
+
+# Initialize available models. The list is fetched in the background and only
+# waited on briefly; if /models is slow the curated list is shown until the
+# sidebar's models_refresh_status reruns the app with the result.
+if not st.session_state.available_models_working and st.session_state.models_future is None:
+    st.session_state.models_future = get_background_executor().submit(fetch_model_ids, OPENROUTER_API_KEY_HASH, OPENROUTER_API_KEY)
     with st.spinner("Loading free models..."):
-        st.session_state.available_models_working = get_available_models_from_api()
-        # Ensure our default model is in the list
-        if not st.session_state.selected_model in st.session_state.available_models_working:
-            st.session_state.selected_model = st.session_state.available_models_working[0] if st.session_state.available_models_working else FREE_MODELS[0]
+        wait([st.session_state.models_future], timeout=MODEL_LIST_WAIT)
+
+if st.session_state.models_future is not None:
+    if st.session_state.models_future.done():
+        st.session_state.available_models_working = get_available_models_from_api(st.session_state.models_future)
+        st.session_state.models_future = None
+    elif not st.session_state.available_models_working:
+        st.session_state.available_models_working = list(FREE_MODELS)
+    # Ensure our default model is in the list
+    if not st.session_state.selected_model in st.session_state.available_models_working:
+        st.session_state.selected_model = st.session_state.available_models_working[0] if st.session_state.available_models_working else FREE_MODELS[0]
+
+def use_model(model_id):
+    """Button callback; runs before the selector is drawn, so no extra rerun is needed."""
+    st.session_state.selected_model = model_id
+    st.session_state.pop("model_selector", None)  # Let the selector take its index from selected_model
+
+def use_recommended_model():
+    """Submit callback for the recommended-models form."""
+    use_model(st.session_state.rec_model_choice)
+
+def refresh_models():
+    """Button callback; refetches the model list in the background."""
+    fetch_model_ids.clear()
+    st.session_state.models_future = get_background_executor().submit(
+        fetch_model_ids, OPENROUTER_API_KEY_HASH, OPENROUTER_API_KEY
+    )
+
+@st.fragment(run_every=1)
+def models_refresh_status():
+    """Poll a pending model-list fetch and rerun the app once it has finished.
+    
+    The model init block above applies the result; the stale list stays usable meanwhile.
+    """
+    if st.session_state.models_future is None or st.session_state.models_future.done():
+        st.rerun()
+    st.caption("🔄 Fetching latest free models...")
+
+def warm_up_model(model_id):
+    """Send a 1-token request in the background so a cold free provider starts up
+    before the first real request; the reply is discarded. Skipped when the
+    rate limit has no tokens to spare."""
+    if model_id in st.session_state.warmed_models:
+        return
+    st.session_state.warmed_models.add(model_id)
+    get_background_executor().submit(
+        call_openrouter_api,
+        model_id,
+        [{"role": "user", "content": "ok"}],
+        max_tokens=1,
+        temperature=0,
+        provider_sort=st.session_state.provider_sort,
+        optional=True
+    )
 
 # Sidebar for configuration
 with st.sidebar:
@@ -388,29 +1305,15 @@ with st.sidebar:
             key="model_selector"
         )
         st.session_state.selected_model = selected
+        warm_up_model(selected)
         
         with st.expander("ℹ️ Model Info"):
             st.markdown(f"**Selected:** `{selected}`")
             
-            # Model descriptions
-            model_desc = {
-                "deepseek-r1t-chimera": "🧠 **DeepSeek R1 Reasoning** - Excellent for step-by-step thinking",
-                "gemini-2.0-flash-exp": "🤖 **Google Gemini 2.0** - Fast and reliable",
-                "llama-3.2": "🦙 **Meta Llama 3.2** - Fast 3B model, good for simple tasks",
-                "llama-3.1": "🦙 **Meta Llama 3.1** - More capable 8B model",
-                "qwen-2.5": "🔷 **Qwen 2.5** - Powerful 32B model by Alibaba",
-                "phi-3.5": "💠 **Microsoft Phi 3.5** - Small but capable",
-                "deepseek-coder": "💻 **DeepSeek Coder** - Specialized for technical tasks",
-                "openchat": "💬 **OpenChat** - Conversational model",
-                "dolphin": "🐬 **Dolphin** - Fine-tuned for helpfulness",
-                "nemotron": "🎮 **NVIDIA Nemotron** - Powerful 70B model",
-                "mistral": "🌪️ **Mistral** - French AI model"
-            }
-            
-            for key, desc in model_desc.items():
-                if key in selected.lower():
-                    st.caption(desc)
-                    break
+            selected_lower = selected.lower()
+            desc = next((desc for key, desc in MODEL_DESCRIPTIONS if key in selected_lower), None)
+            if desc:
+                st.caption(desc)
             
             if ":free" in selected:
                 st.success("🆓 **Free Model** - No credits needed")
@@ -418,10 +1321,14 @@ with st.sidebar:
                 st.warning("💳 **Paid Model** - May consume credits")
     
     # Refresh models button
-    if st.button("🔄 Refresh Models List", use_container_width=True):
-        with st.spinner("Fetching latest free models..."):
-            st.session_state.available_models_working = get_available_models_from_api()
-            st.rerun()
+    st.button(
+        "🔄 Refresh Models List",
+        use_container_width=True,
+        on_click=refresh_models,
+        disabled=st.session_state.models_future is not None
+    )
+    if st.session_state.models_future is not None:
+        models_refresh_status()
     
     # Model recommendations
     st.markdown("---")
@@ -433,12 +1340,23 @@ with st.sidebar:
         ("🦙 Llama 3.2 3B", "meta-llama/llama-3.2-3b-instruct:free", "Quick responses"),
     ]
     
-    for name, model_id, desc in rec_models:
-        if model_id in st.session_state.available_models_working:
-            if st.button(f"Use {name}", key=f"btn_{model_id}", use_container_width=True):
-                st.session_state.selected_model = model_id
-                st.rerun()
-            st.caption(f"*{desc}*")
+    rec_available = [rec for rec in rec_models if rec[1] in st.session_state.available_models_working]
+    if rec_available:
+        # One form instead of a button per model: picking a radio option doesn't rerun
+        with st.form("rec_models_form", border=False):
+            st.radio(
+                "Recommended",
+                [model_id for _, model_id, _ in rec_available],
+                format_func={model_id: name for name, model_id, _ in rec_available}.get,
+                captions=[f"*{desc}*" for _, _, desc in rec_available],
+                key="rec_model_choice",
+                label_visibility="collapsed"
+            )
+            st.form_submit_button(
+                "Use selected",
+                use_container_width=True,
+                on_click=use_recommended_model
+            )
     
     # Difficulty slider
     st.markdown("---")
@@ -459,6 +1377,15 @@ with st.sidebar:
     else:
         st.caption("🔴 **Complex:** Advanced challenges, test your expertise")
 
+    st.markdown("---")
+    routing = st.selectbox(
+        "⚡ Provider routing",
+        list(PROVIDER_ROUTING_OPTIONS),
+        format_func=PROVIDER_ROUTING_OPTIONS.get,
+        help="How OpenRouter picks among the providers serving the selected model"
+    )
+    st.session_state.provider_sort = routing
+    
     st.markdown("---")
     if st.button("🔄 Refresh App", use_container_width=True):
         st.rerun()
@@ -469,90 +1396,126 @@ st.markdown("<br>", unsafe_allow_html=True)
 # Create a centered container
 col_left, col_center, col_right = st.columns([1, 2, 1])
 
-with col_center:
+def start_new_ticket():
+    """New Ticket callback; clears the ticket before the panel is redrawn."""
+    st.session_state.update(TICKET_RESET)
+    if st.session_state.pending_hints:
+        st.session_state.pending_hints[1].cancel()  # Only stops it if not started yet
+        st.session_state.pending_hints = None
+    st.session_state.pop("response_area", None)  # Start the next ticket with an empty box
+
+# Widgets inside a fragment rerun only the fragment, so working on a ticket
+# doesn't re-execute the sidebar and footer. st.rerun() still reruns the app,
+# so state changes go through callbacks where possible.
+@st.fragment
+def ticket_panel(difficulty):
+    """Ticket, solution form and feedback for the centre column."""
     # Main container
     with st.container():
         # Check if ready
         can_generate = st.session_state.selected_model is not None
         
-        # Header section
-        if not st.session_state.ticket:
-            st.markdown("### 🎯 Ready to Practice")
-            if can_generate:
-                model_name = st.session_state.selected_model.split('/')[-1].split(':')[0]
-                st.markdown(f"**Model:** {model_name}")
-                st.markdown(f"**Difficulty:** {difficulty.upper()}")
-                st.markdown("Click 'Generate Practice Ticket' to start.")
+        # Cleared in place once a ticket is issued, so no rerun is needed to hide it
+        intro = st.empty()
+        with intro.container():
+            # Header section
+            if not st.session_state.ticket:
+                st.markdown("### 🎯 Ready to Practice")
+                if can_generate:
+                    model_name = st.session_state.selected_model.split('/')[-1].split(':')[0]
+                    st.markdown(f"**Model:** {model_name}")
+                    st.markdown(f"**Difficulty:** {difficulty.upper()}")
+                    st.markdown("Click 'Generate Practice Ticket' to start.")
                 
-                # Show free model indicator
-                if ":free" in st.session_state.selected_model:
-                    st.success("🆓 Using free model - no credits required")
-            else:
-                st.warning("No models available. Please check your API key.")
+                    # Show free model indicator
+                    if ":free" in st.session_state.selected_model:
+                        st.success("🆓 Using free model - no credits required")
+                else:
+                    st.warning("No models available. Please check your API key.")
         
-        # Generate button
-        if not st.session_state.ticket:
-            if st.button("✨ Generate Practice Ticket", 
-                         type="primary", 
-                         use_container_width=True,
-                         disabled=not can_generate):
+            # Generate button
+            if not st.session_state.ticket:
+                if st.button("✨ Generate Practice Ticket", 
+                             type="primary", 
+                             use_container_width=True,
+                             disabled=not can_generate):
                 
-                with st.spinner(f"Creating {difficulty} ticket with {st.session_state.selected_model.split('/')[-1].split(':')[0]}..."):
-                    try:
-                        prompt = get_ticket_prompt(difficulty)
-                        
-                        messages = [
-                            {
-                                "role": "system",
-                                "content": "You are an IT support ticket generator. Return ONLY valid JSON with 'user' and 'issue' fields. No explanations, just JSON."
-                            },
-                            {
-                                "role": "user", 
-                                "content": prompt
-                            }
-                        ]
-                        
-                        response_text, error = call_openrouter_api(
+                    queue_key = (st.session_state.selected_model, difficulty)
+                    ticket_queue = st.session_state.ticket_queue.setdefault(queue_key, [])
+                    
+                    # Every batch request runs as a future kept in session state, so a click
+                    # that lands while one is in flight waits on it instead of sending another
+                    refill = st.session_state.ticket_refills.get(queue_key)
+                    if refill is None and not ticket_queue:
+                        refill = st.session_state.ticket_refills[queue_key] = get_request_executor().submit(
+                            fetch_ticket_batch,
                             st.session_state.selected_model,
-                            messages,
-                            max_tokens=250,  # Reduced for free models
-                            temperature=0.3
+                            difficulty,
+                            provider_sort=st.session_state.provider_sort
                         )
+                    
+                    # Collect the batch if it's ready, or wait for it if nothing is queued
+                    if refill is not None and (refill.done() or not ticket_queue):
+                        with st.spinner(f"Creating {difficulty} tickets with {st.session_state.selected_model.split('/')[-1].split(':')[0]}..."):
+                            try:
+                                tickets, response_text, error = refill.result()
+                            except Exception as e:
+                                tickets, response_text, error = [], None, f"Error generating ticket: {short_error(e)}"
+                        ticket_queue.extend(tickets)
+                        st.session_state.ticket_refills.pop(queue_key, None)
                         
-                        if error:
-                            st.error(f"API Error: {error}")
-                            # Try a fallback free model
-                            if "not found" in error.lower() or "404" in error:
-                                st.info("Trying alternative free model...")
-                                for fallback in ["google/gemini-2.0-flash-exp:free", "meta-llama/llama-3.2-3b-instruct:free"]:
-                                    if fallback in st.session_state.available_models_working:
-                                        st.session_state.selected_model = fallback
-                                        st.rerun()
-                                        break
-                        elif response_text:
-                            ticket_json = parse_json_from_text(response_text)
-                            
-                            if not ticket_json:
+                        # A failed refill only matters when there's nothing left to hand out
+                        if not ticket_queue:
+                            if error:
+                                st.error(f"API Error: {error}")
+                                # Try a fallback free model
+                                if "not found" in error.lower() or "404" in error:
+                                    st.info("Trying alternative free model...")
+                                    for fallback in ["google/gemini-2.0-flash-exp:free", "meta-llama/llama-3.2-3b-instruct:free"]:
+                                        if fallback in st.session_state.available_models_working and fallback != queue_key[0]:
+                                            use_model(fallback)  # Also drops the selector's own value
+                                            # The rerun clears the error above; a toast outlives it
+                                            st.toast(f"{queue_key[0]} isn't available; switched to {fallback}. Click Generate again.", icon="🔄")
+                                            st.rerun()  # Full rerun so the sidebar selector shows the new model
+                                            break
+                            elif not response_text:
+                                st.error("No response from AI. Please try a different model.")
+                            else:
                                 st.error("Failed to parse JSON. The AI might not have followed instructions. Please try again.")
                                 # Show the raw response for debugging
                                 with st.expander("View raw AI response"):
                                     st.code(response_text[:500])
-                            else:
-                                ticket_json["timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M")
-                                ticket_json["model"] = st.session_state.selected_model
-                                ticket_json["difficulty"] = difficulty
-                                st.session_state.ticket = ticket_json
-                                
-                                st.session_state.agent_response = ""
-                                st.session_state.validation = None
-                                st.session_state.solution_effective = None
-                                
-                                st.rerun()
-                        else:
-                            st.error("No response from AI. Please try a different model.")
-                            
-                    except Exception as e:
-                        st.error(f"Error generating ticket: {str(e)[:100]}")
+                
+                    if ticket_queue:
+                        # Stamp when the ticket is issued, not when its batch was generated
+                        ticket_json = ticket_queue.pop(0)
+                        ticket_json["timestamp"] = time.strftime("%Y-%m-%d %H:%M")
+                        ticket_json["model"] = st.session_state.selected_model
+                        ticket_json["difficulty"] = difficulty
+                        st.session_state.update(TICKET_RESET, ticket=ticket_json)
+                        
+                        if len(ticket_queue) <= TICKET_REFILL_THRESHOLD and queue_key not in st.session_state.ticket_refills:
+                            st.session_state.ticket_refills[queue_key] = get_background_executor().submit(
+                                fetch_ticket_batch,
+                                st.session_state.selected_model,
+                                difficulty,
+                                provider_sort=st.session_state.provider_sort
+                            )
+                    
+                        # Most users ask for hints next. Batches usually bring them along;
+                        # otherwise start the solution-independent part now
+                        ticket_json["starter_hints"] = format_starter_hints(ticket_json.get("starter_hints"))
+                        if not ticket_json["starter_hints"]:
+                            st.session_state.prefetched_hints = get_background_executor().submit(
+                                generate_starter_hints,
+                                ticket_json["model"],
+                                ticket_json.get("issue", ""),
+                                difficulty,
+                                provider_sort=st.session_state.provider_sort,
+                                optional=True
+                            )
+                    
+                        intro.empty()
         
         # Show ticket if exists
         if st.session_state.ticket:
@@ -560,11 +1523,7 @@ with col_center:
             
             # Difficulty badge
             difficulty_badge = ticket.get("difficulty", "medium")
-            badge_color = {
-                "simple": "🟢",
-                "medium": "🟡", 
-                "complex": "🔴"
-            }.get(difficulty_badge, "⚪")
+            badge_color = DIFFICULTY_BADGES.get(difficulty_badge, "⚪")
             
             # Model info
             model_name = ticket.get('model', 'Unknown').split('/')[-1].split(':')[0]
@@ -588,155 +1547,216 @@ with col_center:
             st.markdown("---")
             st.markdown("### 💭 Your Proposed Solution")
             
-            placeholders = {
-                "simple": "Example: First, I would check if the computer is plugged in...",
-                "medium": "Example: Start by checking network settings, then verify firewall rules...",
-                "complex": "Example: Begin with packet capture analysis, check QoS settings, review network topology..."
-            }
-            
-            response = st.text_area(
-                "How would you solve this?",
-                height=150,
-                placeholder=placeholders.get(difficulty_badge, "Describe your solution approach..."),
-                value=st.session_state.agent_response,
-                key="response_area",
-                help=f"Think through the {difficulty_badge} level problem and propose your solution steps."
-            )
+            # Typing in a form doesn't rerun the script; only a submit button does
+            with st.form("solve_form"):
+                response = st.text_area(
+                    "How would you solve this?",
+                    height=150,
+                    placeholder=SOLUTION_PLACEHOLDERS.get(difficulty_badge, "Describe your solution approach..."),
+                    key="response_area",
+                    help=f"Think through the {difficulty_badge} level problem and propose your solution steps."
+                )
+                
+                # Action buttons
+                col_btn1, col_btn2, col_btn3, col_btn4 = st.columns(4)
+                
+                with col_btn1:
+                    hint_text = HINT_BUTTON_LABELS.get(difficulty_badge, "💡 Get Hints")
+                    
+                    hint_clicked = st.form_submit_button(hint_text, use_container_width=True)
+                
+                with col_btn2:
+                    check_clicked = st.form_submit_button("✅ Check Solution", use_container_width=True)
+                
+                with col_btn3:
+                    feedback_clicked = st.form_submit_button("💬 Get Feedback", use_container_width=True)
+                
+                with col_btn4:
+                    st.form_submit_button("🔄 New Ticket", use_container_width=True, on_click=start_new_ticket)
+                
+                if st.session_state.pop("clear_force_check", False):
+                    st.session_state.force_check = False  # Used by the last successful check
+                refresh_verdict = st.checkbox(
+                    "Force re-evaluate",
+                    help="Check Solution normally reuses the earlier verdict for an unchanged solution",
+                    key="force_check"
+                )
             
-            if response != st.session_state.agent_response:
-                st.session_state.agent_response = response
+            # Buttons can't be disabled from unsubmitted text, so check it here
+            needs_more_detail = len(response.split()) < MIN_SOLUTION_WORDS
+            hint_request = (st.session_state.selected_model, difficulty_badge, ticket.get('issue', ''), response)
+            if hint_clicked and not response.strip() and (ticket.get("starter_hints") or st.session_state.prefetched_hints):
+                # Nothing to critique yet, so show the pointers that came with the ticket
+                # or were fetched in the background
+                if ticket.get("starter_hints"):
+                    response_text, error = ticket["starter_hints"], None
+                else:
+                    stream_box = st.empty()
+                    with st.spinner(f"Generating {difficulty_badge} hints..."):
+                        prefetched = st.session_state.prefetched_hints
+                        response_text, error = None, None
+                        if prefetched.done() and not prefetched.cancelled():
+                            response_text, error = prefetched.result()
+                        else:
+                            prefetched.cancel()  # Don't wait behind the prefetch pool; stream it instead
+                        if not response_text:  # Still running, skipped to save rate limit, or it failed
+                            response_text, error = generate_starter_hints(
+                                ticket["model"],
+                                ticket.get('issue', ''),
+                                difficulty_badge,
+                                on_token=stream_box.info,
+                                provider_sort=st.session_state.provider_sort
+                            )
+                        stream_box.empty()
+                if error:
+                    st.error(f"API Error: {error}")
+                elif response_text:
+                    st.session_state.validation = response_text
+                else:
+                    st.error("No response from AI. Please try again.")
+            elif (hint_clicked or check_clicked or feedback_clicked) and not response.strip():
+                st.warning("Describe your solution first, then try again.")
+            elif (check_clicked or feedback_clicked) and needs_more_detail:
+                st.warning("Add a little more detail, e.g. what you would check or change, then try again.")
             
-            # Action buttons
-            col_btn1, col_btn2, col_btn3 = st.columns(3)
+            # Handle actions below the buttons so streamed output gets the full width
+            if hint_clicked and response.strip():
+                stream_box = st.empty()
+                with st.spinner(f"Generating {difficulty_badge} hints..."):
+                    try:
+                        pending, st.session_state.pending_hints = st.session_state.pending_hints, None
+                        response_text, error = None, None
+                        if pending and pending[0] == hint_request and pending[1].done() and not pending[1].cancelled():
+                            # Already fetched alongside the last check of this same solution
+                            response_text, error = pending[1].result()
+                        elif pending:
+                            pending[1].cancel()  # Don't wait behind the prefetch pool; stream it instead
+                        if not response_text:  # Not requested, or it failed (e.g. cool-down)
+                            response_text, error = generate_hints(
+                                st.session_state.selected_model,
+                                ticket.get('issue', ''),
+                                response,
+                                difficulty_badge,
+                                on_token=stream_box.info,
+                                provider_sort=st.session_state.provider_sort
+                            )
+                        
+                        stream_box.empty()  # The hints panel below shows the final text
+                        if error:
+                            st.error(f"API Error: {error}")
+                        elif response_text:
+                            st.session_state.validation = response_text
+                        else:
+                            st.error("No response from AI. Please try again.")
+                        
+                    except Exception as e:
+                        st.error(f"Failed to generate hints: {short_error(e)}")
             
-            with col_btn1:
-                hint_text = {
-                    "simple": "💡 Get Hints",
-                    "medium": "🎯 Get Guidance", 
-                    "complex": "🧠 Get Insights"
-                }.get(difficulty_badge, "💡 Get Hints")
+            if check_clicked and not needs_more_detail:
+                stream_box = st.empty()
+                # Hints are the usual next step, so fetch them while the check runs
+                st.session_state.pending_hints = (hint_request, get_background_executor().submit(
+                    generate_hints,
+                    st.session_state.selected_model,
+                    ticket.get('issue', ''),
+                    response,
+                    difficulty_badge,
+                    provider_sort=st.session_state.provider_sort,
+                    optional=True
+                ))
+                verdict_saved = False
+                with st.spinner("Evaluating solution..."):
+                    try:
+                        response_text, error, judge = validate_on_fast_model(
+                            st.session_state.selected_model,
+                            st.session_state.available_models_working,
+                            ticket.get('issue', ''),
+                            response,
+                            # The verdict prefix arrives first, so the box takes its final colour early
+                            on_token=lambda text: show_verdict(stream_box, text),
+                            provider_sort=st.session_state.provider_sort,
+                            refresh_cache=refresh_verdict
+                        )
+                        
+                        stream_box.empty()  # The evaluation panel below shows the final text
+                        if error:
+                            st.error(f"API Error: {error}")
+                        elif response_text:
+                            st.session_state.solution_effective = response_text
+                            st.session_state.verdict_model = judge
+                            verdict_saved = True
+                        else:
+                            st.error("No response from AI. Please try again.")
+                        
+                    except Exception as e:
+                        st.error(f"Failed to evaluate solution: {short_error(e)}")
                 
-                if st.button(hint_text,
-                            use_container_width=True,
-                            disabled=not response.strip()):
-                    if response.strip():
-                        with st.spinner(f"Generating {difficulty_badge} hints..."):
-                            try:
-                                hint_prompt = get_hint_prompt(
-                                    ticket.get('issue', ''),
-                                    response,
-                                    difficulty_badge
-                                )
-                                
-                                messages = [
-                                    {
-                                        "role": "system",
-                                        "content": "You are an IT mentor providing helpful hints. Be concise and guiding."
-                                    },
-                                    {
-                                        "role": "user", 
-                                        "content": hint_prompt
-                                    }
-                                ]
-                                
-                                response_text, error = call_openrouter_api(
+                if refresh_verdict and verdict_saved:
+                    # Untick only now, so a failed or rate-limited check keeps it for the retry;
+                    # the widget can't be changed after it is drawn, hence the rerun
+                    st.session_state.clear_force_check = True
+                    st.rerun()
+        
+            if feedback_clicked and not needs_more_detail:
+                with st.spinner("Getting feedback on your solution..."):
+                    try:
+                        eval_text, hints_text, error = evaluate_solution(
+                            st.session_state.selected_model,
+                            ticket.get('issue', ''),
+                            response,
+                            difficulty_badge,
+                            provider_sort=st.session_state.provider_sort
+                        )
+                        
+                        judge = st.session_state.selected_model
+                        if not error and not (eval_text and hints_text):
+                            # No usable JSON; fall back to two concurrent requests
+                            (hints_text, hint_error), (eval_text, eval_error, judge) = asyncio.run(
+                                get_hints_and_validate(
                                     st.session_state.selected_model,
-                                    messages,
-                                    max_tokens=300,  # Reduced for free models
-                                    temperature=0.2
-                                )
-                                
-                                if error:
-                                    st.error(f"API Error: {error}")
-                                elif response_text:
-                                    st.session_state.validation = response_text
-                                    st.rerun()
-                                else:
-                                    st.error("No response from AI. Please try again.")
-                                
-                            except Exception as e:
-                                st.error(f"Failed to generate hints: {str(e)[:100]}")
-            
-            with col_btn2:
-                if st.button("✅ Check Solution", 
-                            use_container_width=True,
-                            disabled=not response.strip()):
-                    if response.strip():
-                        with st.spinner("Evaluating solution..."):
-                            try:
-                                validation_prompt = get_validation_prompt(
                                     ticket.get('issue', ''),
-                                    response
-                                )
-                                
-                                messages = [
-                                    {
-                                        "role": "system",
-                                        "content": "You are an IT solution evaluator. Always start with ✅ YES, ⚠️ PARTIALLY, or ❌ NO followed by one sentence."
-                                    },
-                                    {
-                                        "role": "user", 
-                                        "content": validation_prompt
-                                    }
-                                ]
-                                
-                                response_text, error = call_openrouter_api(
-                                    st.session_state.selected_model,
-                                    messages,
-                                    max_tokens=150,  # Reduced for free models
-                                    temperature=0.1
+                                    response,
+                                    difficulty_badge,
+                                    st.session_state.available_models_working,
+                                    provider_sort=st.session_state.provider_sort
                                 )
-                                
-                                if error:
-                                    st.error(f"API Error: {error}")
-                                elif response_text:
-                                    st.session_state.solution_effective = response_text
-                                    st.rerun()
-                                else:
-                                    st.error("No response from AI. Please try again.")
-                                
-                            except Exception as e:
-                                st.error(f"Failed to evaluate solution: {str(e)[:100]}")
-            
-            with col_btn3:
-                if st.button("🔄 New Ticket", 
-                            use_container_width=True):
-                    st.session_state.ticket = None
-                    st.session_state.validation = None
-                    st.session_state.solution_effective = None
-                    st.session_state.agent_response = ""
-                    st.rerun()
+                            )
+                            error = hint_error or eval_error
+                        
+                        if error:
+                            st.error(f"API Error: {error}")
+                        
+                        if hints_text:
+                            st.session_state.validation = hints_text
+                        if eval_text:
+                            st.session_state.solution_effective = eval_text
+                            st.session_state.verdict_model = judge
+                        
+                        if not (hints_text or eval_text or error):
+                            st.error("No response from AI. Please try again.")
+                        
+                    except Exception as e:
+                        st.error(f"Failed to get feedback: {short_error(e)}")
             
-            # Show validation result
+            # Show validation result. Each st.markdown is a separate element, so a
+            # divider is sent together with the heading that follows it.
             if st.session_state.solution_effective:
-                st.markdown("---")
-                st.markdown("### 📊 Solution Evaluation")
+                st.markdown("---\n### 📊 Solution Evaluation")
                 
                 result_text = st.session_state.solution_effective
+                verdict = classify_verdict(result_text)
+                show_verdict(st, result_text, verdict)
+                if st.session_state.verdict_model:
+                    st.caption(f"Judged by `{st.session_state.verdict_model}`")
                 
-                if result_text.startswith("✅ YES"):
-                    st.success(result_text)
-                elif result_text.startswith("⚠️ PARTIALLY"):
-                    st.warning(result_text)
-                elif result_text.startswith("❌ NO"):
-                    st.error(result_text)
-                else:
-                    st.info(result_text)
-                
-                if result_text.startswith("⚠️ PARTIALLY") or result_text.startswith("❌ NO"):
+                if verdict in ("partial", "no"):
                     st.markdown("**💡 Try getting hints to improve your solution!**")
             
             # Show hints
             if st.session_state.validation:
-                st.markdown("---")
-                
-                hint_title = {
-                    "simple": "### 💡 Helpful Hints",
-                    "medium": "### 🎯 Targeted Guidance", 
-                    "complex": "### 🧠 Expert Insights"
-                }.get(difficulty_badge, "### 💭 Guidance")
+                hint_title = HINT_TITLES.get(difficulty_badge, "### 💭 Guidance")
                 
-                st.markdown(hint_title)
+                st.markdown(f"---\n{hint_title}")
                 st.info(st.session_state.validation)
                 
                 if not st.session_state.solution_effective:
@@ -746,55 +1766,23 @@ with col_center:
             if (st.session_state.validation and 
                 st.session_state.solution_effective):
                 
-                st.markdown("---")
-                st.markdown("#### 🤔 Learning Summary")
-                st.markdown("You've received both **hints** to improve your thinking and **evaluation** of your solution's effectiveness!")
-                
-                if st.session_state.solution_effective.startswith(("⚠️ PARTIALLY", "❌ NO")):
-                    st.markdown("**🎯 Try revising your solution using the hints, then check again!**")
+                summary = (
+                    "---\n#### 🤔 Learning Summary\n"
+                    "You've received both **hints** to improve your thinking and **evaluation** of your solution's effectiveness!"
+                )
+                if verdict in ("partial", "no"):
+                    summary += "\n\n**🎯 Try revising your solution using the hints, then check again!**"
+                st.markdown(summary)
         
         # Instructions when no ticket
         else:
             with st.expander("📚 How It Works"):
-                st.markdown("""
-                ### **🎯 Two-Step Learning Process**
-                
-                **1. 💡 Get Helpful Hints**
-                - Get guidance tailored to difficulty level
-                - Improve your thinking without full answers
-                - Learn systematic troubleshooting
-                
-                **2. ✅ Validate Your Solution**
-                - See if your solution would actually work
-                - Get clear evaluation (✅/⚠️/❌)
-                - Understand why solutions succeed or fail
-                
-                **🚀 Learning Path:**
-                Try solution → Get hints → Improve → Check again → Learn!
-                """)
+                st.markdown(HOW_IT_WORKS_MARKDOWN)
+
+with col_center:
+    ticket_panel(difficulty)
 
 # Footer with tips
 st.markdown("<br><br>", unsafe_allow_html=True)
 with st.expander("💡 Tips for Best Results"):
-    st.markdown("""
-    ### **🎯 Using Free Models Effectively:**
-    
-    **Recommended Models:**
-    1. **🧠 DeepSeek R1 Chimera** - Best for reasoning and step-by-step thinking
-    2. **🤖 Gemini 2.0 Flash** - Fast and reliable for most tasks
-    3. **🦙 Llama 3.2 3B** - Quick responses for simple issues
-    
-    **Best Practices:**
-    - Start with **Simple** difficulty if models are slow
-    - Keep your solution descriptions **concise**
-    - If a model fails, try another free model
-    - Free models work best with shorter prompts
-    
-    **Troubleshooting:**
-    - **Model not found**: Click "🔄 Refresh Models List"
-    - **No response**: Try a different free model
-    - **JSON errors**: The model might need clearer instructions
-    - **Slow responses**: Try Llama 3.2 3B (fastest free model)
-    
-    **All models listed are FREE and require no credits!**
-    """)
\ No newline at end of file
+    st.markdown(TIPS_MARKDOWN)
\ No newline at end of file